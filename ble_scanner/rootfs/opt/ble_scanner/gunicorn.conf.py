@@ -6,20 +6,17 @@ bind = "0.0.0.0:8099"
 backlog = 2048
 
 # Worker processes
-workers = 1  # Single worker for this add-on
-worker_class = "gthread"
-threads = 4  # Number of threads per worker
-worker_connections = 1000
-max_requests = 1000
-max_requests_jitter = 50
+# State is process-local (devices, MQTT session, scan tasks); do not scale workers
+# and do not recycle them with max_requests, or the scan state is lost.
+workers = 1
+worker_class = "uvicorn.workers.UvicornWorker"  # ASGI event loop, no thread per request
+# UvicornWorker runs with loop="auto"/http="auto", which select uvloop and
+# httptools when installed; both are pinned in requirements.txt
 timeout = 30
-keepalive = 2
-
-# Restart workers after this many requests, to help prevent memory leaks
-preload_app = False
+keepalive = 5  # matches uvicorn's default, so dashboard polls reuse their connection
 
 # Logging
-accesslog = "-"  # Log to stdout
+accesslog = None  # Off, as in main.py: every dashboard poll would log a line
 errorlog = "-"   # Log to stderr
 loglevel = "info"
 access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(r)s" %(s)s %(b)s "%(f)s" "%(a)s"'
@@ -3,16 +3,29 @@
 BLE Scanner Addon for Home Assistant - MQTT + BLE Proxy Version
 """
 
-import json
+import asyncio
+import gzip
+import hashlib
 import logging
 import os
-import threading
+import random
+import re
+import socket
 import time
-from datetime import datetime
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta
+from functools import lru_cache
 
-import paho.mqtt.client as mqtt
-import requests
-from flask import Flask, jsonify, render_template_string, request
+import aiohttp
+import aiomqtt
+import msgspec
+import orjson
+import uvicorn
+from quart import Quart, Response, jsonify, request, websocket
+from quart.json.provider import DefaultJSONProvider
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,50 +33,394 @@ logger = logging.getLogger(__name__)
 
 ADDON_VERSION = "1.0.65"
 
+# Reconnect backoff: the first BACKOFF_FAST_RETRIES attempts wait the base
+# delay, then min(max, base * factor^n) with +/-25% jitter
+BACKOFF_BASE_DELAY = 1
+BACKOFF_MAX_DELAY = 120
+BACKOFF_FACTOR = 2
+BACKOFF_FAST_RETRIES = 3
+
+# Seconds between scans of a reachable proxy
+SCAN_INTERVAL = 30
+
+# Upper bound on proxy requests in flight at once
+MAX_CONCURRENT_PROXY_REQUESTS = 8
+
+# Proxy HTTP endpoints, tried in order
+PROXY_STATUS_PATHS = ('/api/ble/scan', '/api/status', '/status', '/')
+PROXY_SCAN_PATHS = ('/api/ble/scan',)
+PROXY_ALT_SCAN_PATHS = ('/ble/scan', '/scan', '/devices')
+
+# Canonical MAC address form: upper-case, colon separated
+MAC_RE = re.compile(r'^(?:[0-9A-F]{2}:){5}[0-9A-F]{2}$')
+
+# Scan replies are small JSON: skip gzip negotiation and cap the body size
+PROXY_REQUEST_HEADERS = {'Accept-Encoding': 'identity'}
+PROXY_MAX_RESPONSE_SIZE = 256 * 1024
+
+# Shared proxy HTTP session: pooled keep-alive connections and request timeouts
+PROXY_CONNECTION_LIMIT = 32
+PROXY_KEEPALIVE_TIMEOUT = 60
+PROXY_SCAN_TIMEOUT = aiohttp.ClientTimeout(total=10)
+PROXY_PROBE_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
+# Placeholder in the mqtt options meaning "look it up from Home Assistant"
+AUTO_DETECT = '<auto_detect>'
+
+# MQTT client identity, paho queue limits, broker reconnect backoff cap and
+# fallback-host reachability probe timeout (s).
+MQTT_CLIENT_ID = 'ble_scanner'
+MQTT_MAX_INFLIGHT = 1000
+MQTT_MAX_QUEUED = 10000
+MQTT_RECONNECT_MAX_DELAY = 30
+MQTT_PROBE_TIMEOUT = 3
+
+# Discovery configs are sent once per device and must arrive, so they wait on a
+# PUBACK; state updates are frequent and superseded by the next one, so they don't
+MQTT_DISCOVERY_QOS = 1
+MQTT_STATE_QOS = 0
+
+# Outbound MQTT batching: max devices per flush, queue bound and coalescing window (s)
+MQTT_BATCH_SIZE = 64
+MQTT_QUEUE_MAX = 10000
+MQTT_BATCH_WINDOW = 0.05
+
+# Device persistence: writes are coalesced over this many seconds
+DEVICES_FILE = '/data/ble_devices/devices.json'
+SAVE_DEBOUNCE_DELAY = 2
+
+# Skip state publishes unless RSSI moved this many dB or the last one is this old (s);
+# at most LAST_PUBLISHED_MAX devices are tracked (least recently published evicted)
+RSSI_PUBLISH_THRESHOLD = 3
+STATE_REPUBLISH_INTERVAL = 30
+LAST_PUBLISHED_MAX = 4096
+
+# Devices unseen for DEVICE_TTL seconds are forgotten (checked every
+# DEVICE_PRUNE_INTERVAL s); beyond DEVICE_MAX the least recently seen go first
+DEVICE_TTL = 3600
+DEVICE_MAX = 5000
+DEVICE_PRUNE_INTERVAL = 60
+DEVICE_CHANGES_MAX = 2 * DEVICE_MAX  # change log entries kept for ?since= polling
+
+# Responses of at least COMPRESS_MIN_SIZE bytes are gzipped for clients that accept it
+COMPRESS_MIN_SIZE = 500
+COMPRESS_LEVEL = 6
+COMPRESS_MIMETYPES = {'text/html', 'application/json'}
+
+# Slotted records carry no per-instance __dict__, and orjson serializes them
+# natively, so API responses and saves never build intermediate dicts
+@dataclass(slots=True)
+class Device:
+    """A BLE device reported by one of the proxies"""
+    mac: str
+    name: str | None = None
+    rssi: int | None = None
+    last_seen: str | None = None
+    source: str | None = None
+    manufacturer_data: dict = field(default_factory=dict)
+    service_uuids: list = field(default_factory=list)
+    seen_count: int = 0
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a Device from a stored record, ignoring unknown keys"""
+        return cls(**{f.name: data[f.name] for f in fields(cls) if f.name in data})
+
+@dataclass(slots=True, eq=False)
+class DeviceSubscriber:
+    """A /ws/devices connection: what changed since its last send, drained by its own loop"""
+    changed: set = field(default_factory=set)
+    resync: bool = True
+    status: bool = True
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Route jsonify and request JSON parsing through orjson"""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes straight to the response, skipping the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+class ProxyOptions(msgspec.Struct):
+    """One entry of the bleProxies option"""
+    host: str
+    port: int = 6053
+    password: str = ''
+
+class MqttOptions(msgspec.Struct):
+    """The mqtt option; empty or <auto_detect> values are looked up from Home Assistant"""
+    host: str = ''
+    port: int = 1883
+    username: str = ''
+    password: str = ''
+    discovery: bool = True
+
+class Options(msgspec.Struct):
+    """Add-on options from /data/options.json, validated once at startup"""
+    bleProxies: list[ProxyOptions] = []
+    mqtt: MqttOptions | None = None
+    debounce_ms: int = 250
+
+class Advertisement(msgspec.Struct):
+    """One device entry in a proxy scan response"""
+    mac: str | None = None
+    name: str | None = None
+    rssi: int | None = None
+    manufacturer_data: dict | None = None
+    service_uuids: list | None = None
+
+# Decodes and validates a whole scan response in one pass
+scan_decoder = msgspec.json.Decoder(list[Advertisement], strict=False)
+
 # Global variables
 mqtt_client = None
-config = {}
-discovered_devices = {}
+config = Options()
+discovered_devices = OrderedDict()  # least recently seen first
+background_tasks = []
+event_loop = None
+proxy_semaphore = asyncio.Semaphore(MAX_CONCURRENT_PROXY_REQUESTS)
+http_session = None
+proxy_connections = {}  # "host:port" -> (online, message) from the last poll
+connected_proxy_count = 0
+proxy_wakeups = {}  # "host:port" -> Event that cuts a proxy's backoff short
+mqtt_queue = None
+save_pending = None
+now_iso = datetime.now().isoformat()
+last_published = OrderedDict()
+last_processed = {}  # mac -> monotonic time of the last processed report
+devices_json = None
+devices_json_etag = None
+devices_json_gzip = None  # (devices_version, gzipped devices_json)
+# Bumped on every device table change; starts at the wall clock (microseconds)
+# so a version from before a restart always reads as older than this run's
+devices_version = time.time_ns() // 1000
+device_changes = OrderedDict()  # mac -> devices_version of its last change, oldest first
+device_changes_floor = devices_version  # deltas from before this need the whole table
+device_subscribers = set()
+last_saved_digest = None
+# Device file reads and writes get their own thread, which keeps them in order and
+# out of the default executor, where aiomqtt runs paho's blocking connect()
+device_io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ble_io')
 
-# Create Flask app
-app = Flask(__name__)
+# Create Quart (ASGI) app
+app = Quart(__name__)
+app.json_provider_class = OrjsonProvider
+app.json = OrjsonProvider(app)
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
 
 logger.info("=== BLE SCANNER WITH MQTT STARTING ===")
 
+def parse_mac(address):
+    """Return the canonical upper-case form of a MAC address, or None if invalid"""
+    if not isinstance(address, str):
+        return None
+    mac = address.upper()
+    return mac if MAC_RE.match(mac) else None
+
+@lru_cache(maxsize=DEVICE_MAX)
+def normalize_mac(address):
+    """parse_mac for addresses reported by proxies or loaded from disk"""
+    # Cached so repeat reports skip the upper()/regex and share one key string;
+    # client input goes through parse_mac so junk can't evict real devices
+    return parse_mac(address)
+
+def backoff_delay(attempt):
+    """Capped exponential backoff delay with jitter for reconnect attempt n"""
+    # Retry quickly a few times first; most outages are brief restarts
+    exponent = max(0, attempt - BACKOFF_FAST_RETRIES + 1)
+    delay = min(BACKOFF_MAX_DELAY, BACKOFF_BASE_DELAY * BACKOFF_FACTOR ** exponent)
+    return delay * (1 + random.uniform(-0.25, 0.25))
+
 def load_config():
     """Load Home Assistant add-on configuration"""
     global config
     try:
-        with open('/data/options.json', 'r') as f:
-            config = json.load(f)
-        logger.info(f"Configuration loaded: {list(config.keys())}")
+        with open('/data/options.json', 'rb') as f:
+            # Bad types fail here, at startup, rather than at first use
+            config = msgspec.json.decode(f.read(), type=Options)
+        logger.info(f"Configuration loaded: {len(config.bleProxies)} proxies, mqtt {'set' if config.mqtt else 'missing'}")
         return True
     except Exception as e:
         logger.error(f"Failed to load configuration: {e}")
         return False
 
-def get_ha_mqtt_config():
+def read_devices_file():
+    """Read and parse the persisted device table (blocking, run in a worker thread)"""
+    if not os.path.exists(DEVICES_FILE):
+        return {}
+    with open(DEVICES_FILE, 'rb') as f:
+        stored = orjson.loads(f.read())
+    devices = {}
+    for mac, data in stored.items():
+        mac = normalize_mac(mac)
+        if mac:
+            devices[mac] = Device.from_dict({**data, 'mac': mac})
+    return devices
+
+async def load_devices():
+    """Load previously discovered devices from persistent storage"""
+    try:
+        devices = await event_loop.run_in_executor(device_io_executor, read_devices_file)
+        # Merge on the event loop so discovered_devices keeps a single writer
+        for mac, device in devices.items():
+            discovered_devices.setdefault(mac, device)
+        invalidate_devices_json()
+        notify_devices_reset()
+        if devices:
+            logger.info(f"Loaded {len(devices)} devices from {DEVICES_FILE}")
+            # Don't carry devices that expired while we were down into the first publish.
+            # This relies on every sighting saving last_seen (see process_ble_advertisement);
+            # a stale file would make devices that were live at shutdown look expired
+            prune_devices()
+    except Exception as e:
+        logger.error(f"Failed to load devices: {e}")
+
+def save_devices():
+    """Request a (debounced) write of the device table to disk"""
+    if save_pending is not None:
+        save_pending.set()
+
+def invalidate_devices_json():
+    """Drop the cached device table JSON after a mutation"""
+    global devices_json, devices_json_gzip, devices_version
+    devices_json = None
+    devices_json_gzip = None
+    devices_version += 1
+
+def notify_device_changed(mac):
+    """Queue a device for the next push to every /ws/devices subscriber"""
+    global device_changes_floor
+    device_changes[mac] = devices_version
+    device_changes.move_to_end(mac)
+    if len(device_changes) > DEVICE_CHANGES_MAX:
+        _, device_changes_floor = device_changes.popitem(last=False)
+    for subscriber in device_subscribers:
+        subscriber.changed.add(mac)
+        subscriber.wakeup.set()
+
+def notify_devices_reset():
+    """Make every /ws/devices subscriber resend the whole table"""
+    global device_changes_floor
+    device_changes.clear()
+    device_changes_floor = devices_version
+    for subscriber in device_subscribers:
+        subscriber.resync = True
+        subscriber.wakeup.set()
+
+def notify_status_changed():
+    """Make every /ws/devices subscriber resend the scanner status"""
+    for subscriber in device_subscribers:
+        subscriber.status = True
+        subscriber.wakeup.set()
+
+def serialize_devices():
+    """Snapshot the device table as JSON bytes (call on the event loop)"""
+    global devices_json, devices_json_etag
+    if devices_json is None:
+        devices_json = orjson.dumps(discovered_devices)
+        devices_json_etag = format(zlib.crc32(devices_json), '08x')
+    return devices_json
+
+def serialize_device_changes(since):
+    """Devices changed after version `since` as JSON bytes, or None if the whole table is needed"""
+    if not device_changes_floor <= since <= devices_version:
+        return None
+    # Same shape as a /ws/devices update: oldest first, null for removed devices
+    changes = []
+    for mac in reversed(device_changes):
+        if device_changes[mac] <= since:
+            break
+        changes.append((mac, discovered_devices.get(mac)))
+    return orjson.dumps(dict(reversed(changes)))
+
+def write_devices_atomic(payload):
+    """Write a device snapshot to a temp file and atomically replace the old one"""
+    os.makedirs(os.path.dirname(DEVICES_FILE), exist_ok=True)
+    tmp_path = f"{DEVICES_FILE}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(payload)
+        # Make the data durable before the rename, or a power cut can leave an empty file
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, DEVICES_FILE)
+
+async def flush_devices():
+    """Write the device table to disk unless it matches the last write"""
+    global last_saved_digest
+    # Serialize here so the worker thread never iterates the live dict
+    payload = serialize_devices()
+    digest = hashlib.sha1(payload).digest()
+    if digest == last_saved_digest:
+        return
+    await event_loop.run_in_executor(device_io_executor, write_devices_atomic, payload)
+    last_saved_digest = digest
+
+async def device_saver():
+    """Coalesce save requests into at most one disk write per debounce window"""
+    while True:
+        await save_pending.wait()
+        await asyncio.sleep(SAVE_DEBOUNCE_DELAY)
+        save_pending.clear()
+        try:
+            await flush_devices()
+        except Exception as e:
+            logger.error(f"Failed to save devices: {e}")
+
+@lru_cache(maxsize=1)
+def supervisor_headers():
+    """Authorization headers for the supervisor API, or None without a token"""
+    # The supervisor hands add-ons with hassio_api their token in the environment
+    token = os.getenv('SUPERVISOR_TOKEN')
+    if not token:
+        if not os.path.exists('/data/supervisor_token'):
+            return None
+        with open('/data/supervisor_token', 'r') as f:
+            token = f.read().strip()
+    return {'Authorization': f'Bearer {token}'}
+
+def find_mqtt_credential_files():
+    """Return the typical HA config files that mention MQTT credentials (blocking)"""
+    ha_paths = [
+        '/config/secrets.yaml',
+        '/data/mqtt_credentials.json',
+        '/homeassistant/secrets.yaml'
+    ]
+    
+    found = []
+    for path in ha_paths:
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    content = f.read()
+                    # Look for MQTT credentials in various formats
+                    if 'mqtt_user' in content or 'mqtt_username' in content:
+                        found.append(path)
+            except:
+                continue
+    return found
+
+async def get_ha_mqtt_config():
     """Get MQTT configuration from Home Assistant supervisor API - following smartbed-mqtt pattern"""
     try:
         # Try to get MQTT config from Home Assistant supervisor API
-        import os
-        
         # Check if we have supervisor token
-        if os.path.exists('/data/supervisor_token'):
-            with open('/data/supervisor_token', 'r') as f:
-                token = f.read().strip()
-                
-            headers = {
-                'Authorization': f'Bearer {token}',
-                'Content-Type': 'application/json'
-            }
-            
-            # Try to get MQTT addon config
-            response = requests.get('http://supervisor/addons/core_mosquitto/info', 
-                                  headers=headers, timeout=5)
+        headers = supervisor_headers()
+        if headers:
+            # Try to get MQTT addon config over the shared session
+            async with http_session.get('http://supervisor/addons/core_mosquitto/info',
+                                        headers=headers, timeout=PROXY_PROBE_TIMEOUT) as response:
+                addon_info = orjson.loads(await response.read()) if response.status == 200 else None
             
-            if response.status_code == 200:
-                addon_info = response.json()
+            if addon_info:
                 if addon_info.get('data', {}).get('options'):
                     options = addon_info['data']['options']
                     logger.info("✅ Found MQTT config from Home Assistant supervisor API")
@@ -89,50 +446,53 @@ def get_ha_mqtt_config():
                 'password': mqtt_pass
             }
             
-        # Try to read from typical HA locations
-        ha_paths = [
-            '/config/secrets.yaml',
-            '/data/mqtt_credentials.json',
-            '/homeassistant/secrets.yaml'
-        ]
-        
-        for path in ha_paths:
-            if os.path.exists(path):
-                try:
-                    with open(path, 'r') as f:
-                        content = f.read()
-                        # Look for MQTT credentials in various formats
-                        if 'mqtt_user' in content or 'mqtt_username' in content:
-                            logger.info(f"Found potential MQTT credentials in {path}")
-                            # Could parse YAML/JSON here but risky without proper parsing
-                except:
-                    continue
+        # Try to read from typical HA locations, off the event loop
+        for path in await asyncio.to_thread(find_mqtt_credential_files):
+            logger.info(f"Found potential MQTT credentials in {path}")
+            # Could parse YAML/JSON here but risky without proper parsing
                         
     except Exception as e:
         logger.debug(f"Could not get HA MQTT config: {e}")
         
     return None
 
-def setup_mqtt():
-    """Setup MQTT connection using proven patterns"""
-    global mqtt_client
-    
-    if not config.get('mqtt'):
+async def first_reachable_host(hosts, port):
+    """Return the most preferred host accepting TCP connections on port, or None"""
+    async def accepts(host):
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), MQTT_PROBE_TIMEOUT)
+            writer.close()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            return False
+    # Probe all at once, but stop as soon as the preferred answer is known
+    # instead of waiting out the timeouts of hosts further down the list
+    probes = [asyncio.create_task(accepts(host)) for host in hosts]
+    try:
+        for host, probe in zip(hosts, probes):
+            if await probe:
+                return host
+        return None
+    finally:
+        for probe in probes:
+            probe.cancel()
+
+async def resolve_mqtt_settings():
+    """Work out the broker port and the (host, username, password) pairs to try, in order"""
+    mqtt_config = config.mqtt
+    if mqtt_config is None:
         logger.error("No MQTT configuration found")
-        return False
-        
-    mqtt_config = config['mqtt']
+        return None
     
     # Check if we should use auto_detect
-    use_auto_detect = (
-        mqtt_config.get('host', '').replace('<auto_detect>', '') == '' or
-        mqtt_config.get('username', '').replace('<auto_detect>', '') == '' or
-        mqtt_config.get('password', '').replace('<auto_detect>', '') == ''
+    use_auto_detect = any(
+        value.replace(AUTO_DETECT, '') == ''
+        for value in (mqtt_config.host, mqtt_config.username, mqtt_config.password)
     )
     
     if use_auto_detect:
         logger.info("🔍 Using <auto_detect> - fetching MQTT config from Home Assistant")
-        ha_config = get_ha_mqtt_config()
+        ha_config = await get_ha_mqtt_config()
         if ha_config:
             logger.info(f"✅ Auto-detected MQTT config: {ha_config['host']}:{ha_config['port']}")
             host = ha_config['host']
@@ -141,145 +501,135 @@ def setup_mqtt():
             password = ha_config['password']
         else:
             logger.warning("⚠️ Auto-detect failed, using fallback configuration")
-            host = mqtt_config.get('host', '').replace('<auto_detect>', 'core-mosquitto')
-            port = mqtt_config.get('port', 1883)
-            username = mqtt_config.get('username', '').replace('<auto_detect>', '')
-            password = mqtt_config.get('password', '').replace('<auto_detect>', '')
+            host = mqtt_config.host.replace(AUTO_DETECT, 'core-mosquitto')
+            port = mqtt_config.port
+            username = mqtt_config.username.replace(AUTO_DETECT, '')
+            password = mqtt_config.password.replace(AUTO_DETECT, '')
     else:
         # Use manual configuration
-        host = mqtt_config.get('host', 'core-mosquitto')
-        port = mqtt_config.get('port', 1883)
-        username = mqtt_config.get('username', '')
-        password = mqtt_config.get('password', '')
+        host = mqtt_config.host
+        port = mqtt_config.port
+        username = mqtt_config.username
+        password = mqtt_config.password
     
     # Determine hosts to try
     if host:
         hosts_to_try = [host]
     else:
         hosts_to_try = ['core-mosquitto', 'localhost', 'homeassistant.local']
+        # Probe the fallbacks in parallel and go straight to the first one up, so
+        # connection attempts don't wait out a timeout per dead host
+        reachable = await first_reachable_host(hosts_to_try, port)
+        if reachable:
+            hosts_to_try = [reachable]
     
-    # Try without authentication first (like many working examples)
-    for host in hosts_to_try:
-        try:
-            logger.info(f"🔗 Trying MQTT broker: {host}:{port}")
-            
-            # Create new client
-            mqtt_client = mqtt.Client()
-            mqtt_client.on_connect = on_mqtt_connect
-            mqtt_client.on_disconnect = on_mqtt_disconnect
-            mqtt_client.on_message = on_mqtt_message
-            
-            # Try connecting without authentication first
-            mqtt_client.connect(host, port, 60)
-            mqtt_client.loop_start()
-            
-            # Wait a moment to see if connection succeeds
-            time.sleep(2)
-            
-            if mqtt_client.is_connected():
-                logger.info(f"✅ MQTT connected to {host}:{port} (no auth)")
-                return True
-            else:
-                logger.warning(f"Failed to connect to {host}:{port} without auth")
-                mqtt_client.loop_stop()
-                mqtt_client.disconnect()
-                
-        except Exception as e:
-            logger.warning(f"MQTT connection to {host}:{port} failed: {e}")
-            if mqtt_client:
-                try:
-                    mqtt_client.loop_stop()
-                    mqtt_client.disconnect()
-                except:
-                    pass
-    
-    # Try with credentials if available
+    # Try without authentication first (like many working examples), then with credentials
+    candidates = [(host, None, None) for host in hosts_to_try]
     if username and password:
-        for host in hosts_to_try:
+        candidates += [(host, username, password) for host in hosts_to_try]
+    return port, candidates
+
+def new_mqtt_client(host, port, username=None, password=None):
+    """Create an asyncio MQTT client with our identity and paho queue limits"""
+    return aiomqtt.Client(
+        host,
+        port,
+        username=username,
+        password=password,
+        client_id=MQTT_CLIENT_ID,
+        clean_session=True,
+        keepalive=60,
+        max_inflight_messages=MQTT_MAX_INFLIGHT,
+        max_queued_messages=MQTT_MAX_QUEUED
+    )
+
+async def mqtt_supervisor():
+    """Own the broker connection: find a host/credential pair that works, then keep it connected"""
+    global mqtt_client
+    settings = await resolve_mqtt_settings()
+    if settings is None:
+        return
+    port, candidates = settings
+    attempt = 0
+    
+    while True:
+        for host, username, password in candidates:
+            auth = f"with {username}:***" if username else "(no auth)"
+            was_connected = False
             try:
-                logger.info(f"🔑 Trying MQTT {host}:{port} with credentials {username}:***")
-                
-                mqtt_client = mqtt.Client()
-                mqtt_client.on_connect = on_mqtt_connect
-                mqtt_client.on_disconnect = on_mqtt_disconnect
-                mqtt_client.on_message = on_mqtt_message
-                
-                mqtt_client.username_pw_set(username, password)
-                mqtt_client.connect(host, port, 60)
-                mqtt_client.loop_start()
-                
-                time.sleep(2)
-                
-                if mqtt_client.is_connected():
-                    logger.info(f"✅ MQTT connected to {host}:{port} with {username}:***")
-                    return True
+                logger.info(f"🔗 Trying MQTT broker: {host}:{port} {auth}")
+                async with new_mqtt_client(host, port, username, password) as client:
+                    logger.info(f"✅ MQTT connected to {host}:{port} {auth}")
+                    # Reconnect straight to the pair that worked from now on
+                    candidates = [(host, username, password)]
+                    attempt = 0
+                    async with client.messages() as messages:
+                        # Subscribe to Home Assistant status for device republishing
+                        await client.subscribe("homeassistant/status")
+                        logger.info("📡 Subscribed to Home Assistant status updates")
+                        mqtt_client = client
+                        was_connected = True
+                        notify_status_changed()
+                        # Anything discovered while disconnected still needs its entities
+                        republish_all_devices()
+                        async for message in messages:
+                            on_mqtt_message(message)
+            except aiomqtt.MqttError as e:
+                if was_connected:
+                    logger.warning(f"MQTT disconnected: {e}")
                 else:
-                    mqtt_client.loop_stop()
-                    mqtt_client.disconnect()
+                    logger.warning(f"MQTT connection to {host}:{port} {auth} failed: {e}")
+            except Exception:
+                # Anything else is a bug, but it must not end the supervisor for good
+                logger.exception(f"Unexpected MQTT error with {host}:{port}")
+            finally:
+                mqtt_client = None
+            if was_connected:
+                notify_status_changed()
+                break
             
-            except Exception as e:
-                logger.debug(f"MQTT auth {username} to {host}:{port} failed: {e}")
-                if mqtt_client:
-                    try:
-                        mqtt_client.loop_stop()
-                        mqtt_client.disconnect()
-                    except:
-                        pass
-
-    logger.error("❌ All MQTT connection attempts failed")
-    mqtt_client = None
-    return False
-
-def on_mqtt_connect(client, userdata, flags, rc):
-    """MQTT connection callback"""
-    if rc == 0:
-        logger.info("✅ MQTT connected successfully")
-        # Subscribe to Home Assistant status for device republishing
-        try:
-            client.subscribe("homeassistant/status")
-            logger.info("📡 Subscribed to Home Assistant status updates")
-        except Exception as e:
-            logger.warning(f"Failed to subscribe to HA status: {e}")
-    else:
-        logger.error(f"MQTT connection failed with code {rc}")
-
-def on_mqtt_disconnect(client, userdata, rc):
-    """MQTT disconnection callback"""
-    logger.warning("MQTT disconnected")
+        delay = min(MQTT_RECONNECT_MAX_DELAY, backoff_delay(attempt))
+        attempt += 1
+        logger.info(f"🔁 Retrying MQTT in {delay:.0f}s")
+        await asyncio.sleep(delay)
 
-def on_mqtt_message(client, userdata, message):
-    """MQTT message callback"""
+def on_mqtt_message(message):
+    """Handle a message on a subscribed topic (runs on the event loop)"""
     try:
-        topic = message.topic
-        payload = message.payload.decode('utf-8')
-        
-        if topic == "homeassistant/status" and payload == "online":
+        if message.topic.matches("homeassistant/status") and message.payload == b"online":
             logger.info("Home Assistant is online - republishing device discoveries")
             # Republish all discovered devices when HA comes back online
-            for mac, device in discovered_devices.items():
-                create_mqtt_device(mac, device)
+            republish_all_devices()
                 
     except Exception as e:
         logger.error(f"Error processing MQTT message: {e}")
 
-def test_ble_proxy(proxy_host, proxy_port):
+@lru_cache(maxsize=64)
+def proxy_urls(proxy_host, proxy_port, paths):
+    """Build (once per proxy) the full URLs for a tuple of endpoint paths"""
+    return tuple(f"http://{proxy_host}:{proxy_port}{path}" for path in paths)
+
+async def read_proxy_scan(response):
+    """Decode a proxy scan response, refusing bodies over PROXY_MAX_RESPONSE_SIZE"""
+    body = bytearray()
+    async for chunk in response.content.iter_any():
+        body += chunk
+        if len(body) > PROXY_MAX_RESPONSE_SIZE:
+            raise ValueError(f"response exceeds {PROXY_MAX_RESPONSE_SIZE} bytes")
+    return scan_decoder.decode(body)
+
+async def test_ble_proxy(proxy_host, proxy_port):
     """Test BLE proxy connectivity"""
     try:
         # Try different common endpoints
-        endpoints = [
-            f"http://{proxy_host}:{proxy_port}/api/ble/scan",
-            f"http://{proxy_host}:{proxy_port}/api/status",
-            f"http://{proxy_host}:{proxy_port}/status",
-            f"http://{proxy_host}:{proxy_port}/"
-        ]
-        
-        for endpoint in endpoints:
+        for endpoint in proxy_urls(proxy_host, proxy_port, PROXY_STATUS_PATHS):
             try:
-                response = requests.get(endpoint, timeout=5)
-                if response.status_code == 200:
-                    logger.info(f"BLE proxy {proxy_host}:{proxy_port} responding on {endpoint}")
-                    return True, f"OK - {endpoint}"
-            except:
+                # Only the status matters here, so don't download the body
+                async with http_session.get(endpoint, timeout=PROXY_PROBE_TIMEOUT) as response:
+                    if response.status == 200:
+                        logger.info(f"BLE proxy {proxy_host}:{proxy_port} responding on {endpoint}")
+                        return True, f"OK - {endpoint}"
+            except Exception:
                 continue
                 
         return False, "No response from any endpoint"
@@ -287,199 +637,477 @@ def test_ble_proxy(proxy_host, proxy_port):
     except Exception as e:
         return False, str(e)
 
-def scan_ble_proxy(proxy_host, proxy_port):
-    """Scan BLE devices via ESP32 proxy"""
+async def scan_ble_proxy(proxy_host, proxy_port):
+    """Scan BLE devices via ESP32 proxy, returns None if the proxy is unreachable"""
     try:
         # First try the expected endpoint
-        url = f"http://{proxy_host}:{proxy_port}/api/ble/scan"
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code == 200:
-            devices = response.json()
-            logger.info(f"Found {len(devices)} BLE devices via proxy {proxy_host}")
-            return devices
-        else:
-            logger.warning(f"BLE proxy {proxy_host} returned status {response.status_code}")
-            
-            # Try alternative endpoints if main one fails
-            alt_endpoints = [
-                f"http://{proxy_host}:{proxy_port}/ble/scan",
-                f"http://{proxy_host}:{proxy_port}/scan",
-                f"http://{proxy_host}:{proxy_port}/devices"
-            ]
+        url, = proxy_urls(proxy_host, proxy_port, PROXY_SCAN_PATHS)
+        async with http_session.get(url, timeout=PROXY_SCAN_TIMEOUT) as response:
+            if response.status == 200:
+                devices = await read_proxy_scan(response)
+                logger.debug("Found %d BLE devices via proxy %s", len(devices), proxy_host)
+                return devices
+            logger.warning(f"BLE proxy {proxy_host} returned status {response.status}")
             
-            for alt_url in alt_endpoints:
-                try:
-                    response = requests.get(alt_url, timeout=5)
-                    if response.status_code == 200:
-                        devices = response.json()
-                        logger.info(f"Found {len(devices)} BLE devices via proxy {proxy_host} (alt endpoint)")
+        # Try alternative endpoints if main one fails
+        for alt_url in proxy_urls(proxy_host, proxy_port, PROXY_ALT_SCAN_PATHS):
+            try:
+                async with http_session.get(alt_url, timeout=PROXY_PROBE_TIMEOUT) as response:
+                    if response.status == 200:
+                        devices = await read_proxy_scan(response)
+                        logger.debug("Found %d BLE devices via proxy %s (alt endpoint)", len(devices), proxy_host)
                         return devices
-                except:
-                    continue
-                    
-            return []
+            except Exception:
+                continue
+                
+        return None
             
     except Exception as e:
         logger.error(f"Failed to scan BLE proxy {proxy_host}: {e}")
-        return []
+        return None
+
+@lru_cache(maxsize=DEVICE_MAX)
+def state_topics(mac_address):
+    """Build (once per device) the presence, rssi, last_seen and attributes topics"""
+    base_topic = f"ble_scanner/ble_device_{mac_address.replace(':', '_').lower()}"
+    return (f"{base_topic}/presence", f"{base_topic}/rssi",
+            f"{base_topic}/last_seen", f"{base_topic}/attributes")
+
+def discovery_messages(mac_address, friendly_name, has_rssi):
+    """Build the retained discovery topics and payloads for a device"""
+    # Built on demand: discovery is only sent for new or renamed devices and on the
+    # rare republish after an HA restart, so caching it per device isn't worth the memory
+    # Clean MAC for device naming (following smartbed-mqtt conventions)
+    clean_mac = mac_address.replace(':', '_').lower()
+    device_name = f"ble_device_{clean_mac}"
+    
+    # Base discovery topic structure (like smartbed-mqtt)
+    base_topic = f"ble_scanner/{device_name}"
+    
+    # Device information (following HA device discovery spec)
+    device_config = {
+        "identifiers": [f"ble_scanner_{clean_mac}"],
+        "name": friendly_name,
+        "manufacturer": "BLE Scanner",
+        "model": "BLE Device",
+        "sw_version": ADDON_VERSION,
+        "via_device": "ble_scanner_addon"
+    }
+    
+    # Add additional device info if available
+    if has_rssi:
+        device_config["configuration_url"] = f"http://homeassistant.local:8123"
+        
+    # Create sensor for device presence (main entity)
+    presence_config = {
+        "name": f"{friendly_name} Presence",
+        "unique_id": f"ble_scanner_{clean_mac}_presence",
+        "state_topic": f"{base_topic}/presence",
+        "device_class": "connectivity",
+        "payload_on": "online",
+        "payload_off": "offline",
+        "device": device_config
+    }
+    
+    # Create sensor for RSSI
+    rssi_config = {
+        "name": f"{friendly_name} RSSI",
+        "unique_id": f"ble_scanner_{clean_mac}_rssi",
+        "state_topic": f"{base_topic}/rssi",
+        "device_class": "signal_strength",
+        "unit_of_measurement": "dBm",
+        "state_class": "measurement",
+        "device": device_config
+    }
+    
+    # Create sensor for last seen
+    last_seen_config = {
+        "name": f"{friendly_name} Last Seen",
+        "unique_id": f"ble_scanner_{clean_mac}_last_seen",
+        "state_topic": f"{base_topic}/last_seen",
+        "device_class": "timestamp",
+        "device": device_config
+    }
+    
+    return (
+        (f"homeassistant/binary_sensor/{device_name}_presence/config", orjson.dumps(presence_config)),
+        (f"homeassistant/sensor/{device_name}_rssi/config", orjson.dumps(rssi_config)),
+        (f"homeassistant/sensor/{device_name}_last_seen/config", orjson.dumps(last_seen_config))
+    )
 
-def create_mqtt_device(mac_address, device_info):
+async def create_mqtt_device(mac_address, device_info):
     """Create MQTT device discovery message following smartbed-mqtt patterns"""
-    if not mqtt_client or not mqtt_client.is_connected():
+    if mqtt_client is None:
         logger.error("MQTT client not connected")
         return False
         
     try:
-        # Clean MAC for device naming (following smartbed-mqtt conventions)
-        clean_mac = mac_address.replace(':', '_').lower()
-        device_name = f"ble_device_{clean_mac}"
-        friendly_name = device_info.get('name', f"BLE Device {mac_address}")
-        
-        # Base discovery topic structure (like smartbed-mqtt)
-        base_topic = f"ble_scanner/{device_name}"
-        
-        # Device information (following HA device discovery spec)
-        device_config = {
-            "identifiers": [f"ble_scanner_{clean_mac}"],
-            "name": friendly_name,
-            "manufacturer": "BLE Scanner",
-            "model": "BLE Device",
-            "sw_version": ADDON_VERSION,
-            "via_device": "ble_scanner_addon"
-        }
-        
-        # Add additional device info if available
-        if device_info.get('rssi'):
-            device_config["configuration_url"] = f"http://homeassistant.local:8123"
-            
-        # Create sensor for device presence (main entity)
-        presence_config = {
-            "name": f"{friendly_name} Presence",
-            "unique_id": f"ble_scanner_{clean_mac}_presence",
-            "state_topic": f"{base_topic}/presence",
-            "device_class": "connectivity",
-            "payload_on": "online",
-            "payload_off": "offline",
-            "device": device_config
-        }
-        
-        # Create sensor for RSSI
-        rssi_config = {
-            "name": f"{friendly_name} RSSI",
-            "unique_id": f"ble_scanner_{clean_mac}_rssi",
-            "state_topic": f"{base_topic}/rssi",
-            "device_class": "signal_strength",
-            "unit_of_measurement": "dBm",
-            "state_class": "measurement",
-            "device": device_config
-        }
-        
-        # Create sensor for last seen
-        last_seen_config = {
-            "name": f"{friendly_name} Last Seen",
-            "unique_id": f"ble_scanner_{clean_mac}_last_seen",
-            "state_topic": f"{base_topic}/last_seen",
-            "device_class": "timestamp",
-            "device": device_config
-        }
+        friendly_name = device_info.name or f"BLE Device {mac_address}"
         
         # Publish discovery messages (following smartbed-mqtt patterns)
-        mqtt_client.publish(
-            f"homeassistant/binary_sensor/{device_name}_presence/config",
-            json.dumps(presence_config),
-            retain=True
-        )
-        
-        mqtt_client.publish(
-            f"homeassistant/sensor/{device_name}_rssi/config", 
-            json.dumps(rssi_config),
-            retain=True
-        )
-        
-        mqtt_client.publish(
-            f"homeassistant/sensor/{device_name}_last_seen/config",
-            json.dumps(last_seen_config), 
-            retain=True
-        )
+        for topic, payload in discovery_messages(mac_address, friendly_name, bool(device_info.rssi)):
+            await mqtt_client.publish(topic, payload, qos=MQTT_DISCOVERY_QOS, retain=True)
         
         # Publish current state
-        mqtt_client.publish(f"{base_topic}/presence", "online", retain=True)
-        mqtt_client.publish(f"{base_topic}/rssi", str(device_info.get('rssi', 0)), retain=True)
-        mqtt_client.publish(f"{base_topic}/last_seen", datetime.now().isoformat(), retain=True)
+        await publish_device_state(mac_address, device_info)
         
         # Publish attributes topic for additional info
         attributes = {
             "mac_address": mac_address,
-            "source": device_info.get('source', 'unknown'),
-            "discovery_time": datetime.now().isoformat(),
+            "source": device_info.source or 'unknown',
+            "discovery_time": now_iso,
             "addon_version": ADDON_VERSION
         }
         
-        mqtt_client.publish(f"{base_topic}/attributes", json.dumps(attributes), retain=True)
+        await mqtt_client.publish(state_topics(mac_address)[3], orjson.dumps(attributes), qos=MQTT_DISCOVERY_QOS, retain=True)
         
-        logger.info(f"✅ Created MQTT device entities for {mac_address} ({friendly_name})")
+        logger.info("✅ Created MQTT device entities for %s (%s)", mac_address, friendly_name)
         return True
         
     except Exception as e:
         logger.error(f"Failed to create MQTT device for {mac_address}: {e}")
         return False
 
-def ble_scanner_thread():
-    """Background thread for BLE scanning"""
-    logger.info("BLE scanner thread started")
+async def publish_device_state(mac_address, device_info, presence=True):
+    """Publish presence, RSSI and last seen state for an already created device"""
+    if mqtt_client is None:
+        return False
+        
+    presence_topic, rssi_topic, last_seen_topic, _ = state_topics(mac_address)
+    # Presence is retained and never changes once online, so updates skip it
+    if presence:
+        await mqtt_client.publish(presence_topic, "online", qos=MQTT_STATE_QOS, retain=True)
+    await mqtt_client.publish(rssi_topic, str(device_info.rssi or 0), qos=MQTT_STATE_QOS, retain=True)
+    await mqtt_client.publish(last_seen_topic, device_info.last_seen or now_iso, qos=MQTT_STATE_QOS, retain=True)
+    return True
+
+def republish_all_devices():
+    """Queue discovery for every known device (runs on the event loop)"""
+    for mac in discovered_devices:
+        queue_mqtt_update(mac, True)
+
+def queue_mqtt_update(mac_address, is_new):
+    """Queue a device for the MQTT publisher instead of publishing inline"""
+    if mqtt_queue is None:
+        return
+    try:
+        mqtt_queue.put_nowait((mac_address, is_new))
+    except asyncio.QueueFull:
+        logger.debug("MQTT queue full, dropping update for %s", mac_address)
+
+async def mqtt_publish_loop():
+    """Publish queued device updates in batches, coalescing repeats per device"""
+    while True:
+        mac, is_new = await mqtt_queue.get()
+        batch = {mac: is_new}
+        
+        # Collect until the window closes or the batch is full, whichever is first
+        deadline = event_loop.time() + MQTT_BATCH_WINDOW
+        while len(batch) < MQTT_BATCH_SIZE:
+            if mqtt_queue.empty():
+                remaining = deadline - event_loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    mac, is_new = await asyncio.wait_for(mqtt_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                mac, is_new = mqtt_queue.get_nowait()
+            batch[mac] = batch.get(mac, False) or is_new
+            
+        # Cork the socket so the batch's small PUBLISH packets share TCP segments;
+        # discovery waits on PUBACKs, which a corked socket would hold back
+        cork = not any(batch.values())
+        if cork:
+            cork_mqtt_socket(True)
+        try:
+            await publish_batch(batch)
+        finally:
+            if cork:
+                cork_mqtt_socket(False)
+
+async def publish_batch(batch):
+    """Publish discovery or state for each device in a coalesced batch"""
+    # Devices go out concurrently so their packets are written together;
+    # each device's own messages stay in order (discovery before state)
+    await asyncio.gather(*(publish_device(mac, is_new) for mac, is_new in batch.items()))
+
+async def publish_device(mac, is_new):
+    """Publish one queued device update and record it for deduplication"""
+    device = discovered_devices.get(mac)
+    if device is None:
+        return  # Cleared while queued
+    # The device can change while the publishes are awaited; record what this one started from
+    sent = (device.rssi or 0, device.name)
+    try:
+        if is_new:
+            published = await create_mqtt_device(mac, device)
+        else:
+            published = await publish_device_state(mac, device, presence=False)
+        if published:
+            last_published[mac] = (sent[0], time.monotonic(), sent[1])
+            last_published.move_to_end(mac)
+            if len(last_published) > LAST_PUBLISHED_MAX:
+                last_published.popitem(last=False)
+            logger.debug("Published device to MQTT: %s", mac)
+    except Exception as e:
+        logger.error("MQTT publish for %s failed: %s", mac, e)
+
+def cork_mqtt_socket(enabled):
+    """Toggle TCP_CORK on the broker socket; clearing it flushes what was held back"""
+    if mqtt_client is None or not hasattr(socket, 'TCP_CORK'):
+        return
+    # aiomqtt drives a paho client underneath; its socket is only reachable through
+    # private attributes, so if a future aiomqtt moves them corking is just skipped
+    try:
+        paho = getattr(mqtt_client, '_client', None)
+        sock = paho.socket() if paho is not None else None
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, int(enabled))
+    except Exception as e:
+        logger.debug("Could not set TCP_CORK on the MQTT socket: %s", e)
+
+def forget_device_state(mac):
+    """Drop the per-device bookkeeping kept alongside discovered_devices"""
+    last_published.pop(mac, None)
+    last_processed.pop(mac, None)
+
+def prune_devices():
+    """Drop expired devices and trim the table to DEVICE_MAX, oldest first"""
+    # ISO timestamps in one format order lexically, so no parsing is needed;
+    # the table is in recency order, so stop at the first fresh device
+    cutoff = (datetime.now() - timedelta(seconds=DEVICE_TTL)).isoformat()
+    removed = 0
+    while discovered_devices:
+        mac, device = next(iter(discovered_devices.items()))
+        if (len(discovered_devices) <= DEVICE_MAX
+                and device.last_seen and device.last_seen >= cutoff):
+            break
+        del discovered_devices[mac]
+        forget_device_state(mac)
+        removed += 1
+    if removed:
+        invalidate_devices_json()
+        notify_devices_reset()
+        save_devices()
+        logger.info(f"Pruned {removed} stale BLE devices")
+    return removed
+
+async def device_pruner():
+    """Periodically forget devices that have not been seen for DEVICE_TTL"""
+    while True:
+        await asyncio.sleep(DEVICE_PRUNE_INTERVAL)
+        try:
+            prune_devices()
+        except Exception as e:
+            logger.error(f"Device pruning failed: {e}")
+
+def tick_clock():
+    """Refresh now_iso once per batch so per-device updates don't format their own timestamps"""
+    global now_iso
+    now_iso = datetime.now().isoformat()
+    return now_iso
+
+def process_ble_advertisement(adv, source):
+    """Record a device reported by a proxy scan, returns True if it is new"""
+    # Drop malformed addresses before doing any other work
+    mac = normalize_mac(adv.mac)
+    if not mac:
+        return False
+        
+    device = discovered_devices.get(mac)
+    now = time.monotonic()
+    # Repeat reports (several proxies, manual scans) within the window are dropped
+    if device is not None and now - last_processed.get(mac, 0) < config.debounce_ms / 1000:
+        return False
+    last_processed[mac] = now
+    
+    if device is None:
+        logger.info("New BLE device discovered: %s from %s", mac, source)
+        discovered_devices[mac] = Device(
+            mac=mac,
+            name=adv.name,
+            rssi=adv.rssi,
+            last_seen=now_iso,
+            source=source,
+            manufacturer_data=adv.manufacturer_data or {},
+            service_uuids=adv.service_uuids or [],
+            seen_count=1
+        )
+        invalidate_devices_json()
+        notify_device_changed(mac)
+        if len(discovered_devices) > DEVICE_MAX:
+            evicted, _ = discovered_devices.popitem(last=False)
+            forget_device_state(evicted)
+            notify_device_changed(evicted)
+        queue_mqtt_update(mac, True)
+        save_devices()
+        return True
+        
+    # Update the existing record in place rather than allocating a new one
+    discovered_devices.move_to_end(mac)
+    device.seen_count += 1
+    # Fields the proxy left out keep their previous values
+    if adv.name is not None:
+        device.name = adv.name
+    if adv.rssi is not None:
+        device.rssi = adv.rssi
+    device.last_seen = now_iso
+    device.source = source
+    if adv.manufacturer_data is not None:
+        device.manufacturer_data = adv.manufacturer_data
+    if adv.service_uuids is not None:
+        device.service_uuids = adv.service_uuids
+    invalidate_devices_json()
+    notify_device_changed(mac)
+    # Keep the saved last_seen current; saves are debounced, so this is one write per window
+    save_devices()
+    
+    # A new name changes the entity names, so rediscover rather than update
+    last = last_published.get(mac)
+    if last and last[2] != device.name:
+        queue_mqtt_update(mac, True)
+        return False
+        
+    # Only publish when the state meaningfully changed or is getting stale
+    if (last and abs((device.rssi or 0) - last[0]) < RSSI_PUBLISH_THRESHOLD
+            and now - last[1] < STATE_REPUBLISH_INTERVAL):
+        return False
+    queue_mqtt_update(mac, False)
+    return False
+
+def configured_proxies():
+    """Return (host, port) for every configured BLE proxy"""
+    return [(proxy.host, proxy.port) for proxy in config.bleProxies if proxy.host]
+
+async def probe_proxy(host, port):
+    """Probe a proxy's connectivity, bounded by proxy_semaphore"""
+    async with proxy_semaphore:
+        return await test_ble_proxy(host, port)
+
+async def fetch_proxy_scan(host, port):
+    """Fetch a proxy's scan results, bounded by proxy_semaphore"""
+    async with proxy_semaphore:
+        return await scan_ble_proxy(host, port)
+
+def set_proxy_status(source, online, message):
+    """Record a proxy's latest poll outcome and keep the online count in step"""
+    global connected_proxy_count
+    previous = proxy_connections.get(source, (False, None))
+    if online != previous[0]:
+        connected_proxy_count += 1 if online else -1
+    proxy_connections[source] = (online, message)
+    if (online, message) != previous:
+        notify_status_changed()
+
+async def proxy_backoff(source, delay):
+    """Wait out a proxy's backoff, returning early once a manual scan reaches it"""
+    wakeup = proxy_wakeups.get(source)
+    if wakeup is None:
+        wakeup = proxy_wakeups[source] = asyncio.Event()
+    wakeup.clear()
+    try:
+        await asyncio.wait_for(wakeup.wait(), delay)
+    except asyncio.TimeoutError:
+        pass
+
+async def proxy_supervisor(host, port):
+    """Poll one proxy for its whole lifetime, backing off while it is unreachable"""
+    source = f"{host}:{port}"
+    attempt = 0
+    logger.info(f"BLE scanning started for proxy {source}")
     
     while True:
         try:
-            if not config.get('bleProxies'):
-                time.sleep(30)
+            devices = await fetch_proxy_scan(host, port)
+            
+            if devices is None:
+                delay = backoff_delay(attempt)
+                attempt += 1
+                logger.info("Proxy %s unreachable, retrying in %.0fs", source, delay)
+                set_proxy_status(source, False, f"Unreachable, retrying in {delay:.0f}s")
+                await proxy_backoff(source, delay)
                 continue
+            attempt = 0
+            set_proxy_status(source, True, f"OK - {len(devices)} devices in last scan")
+            
+            tick_clock()
+            for adv in devices:
+                process_ble_advertisement(adv, source)
                 
-            for proxy in config['bleProxies']:
-                host = proxy.get('host')
-                port = proxy.get('port', 6053)
-                
-                if host:
-                    devices = scan_ble_proxy(host, port)
-                    
-                    for device in devices:
-                        mac = device.get('mac')
-                        if mac:
-                            device['source'] = f"{host}:{port}"
-                            device['last_seen'] = datetime.now().isoformat()
-                            
-                            if mac not in discovered_devices:
-                                logger.info(f"New BLE device discovered: {mac} from {host}:{port}")
-                                discovered_devices[mac] = device
-                                create_mqtt_device(mac, device)
-                            else:
-                                # Update existing device info
-                                discovered_devices[mac].update(device)
-                            
-            time.sleep(30)  # Scan every 30 seconds
+            await asyncio.sleep(SCAN_INTERVAL)
             
         except Exception as e:
-            logger.error(f"BLE scanner thread error: {e}")
-            time.sleep(60)
+            logger.error("BLE scan error for proxy %s: %s", source, e)
+            set_proxy_status(source, False, str(e))
+            await asyncio.sleep(max(SCAN_INTERVAL, backoff_delay(attempt)))
+            attempt += 1
 
-@app.route('/')
-def index():
-    """Main dashboard"""
-    # Test proxy connectivity
-    proxy_status = []
-    for proxy in config.get('bleProxies', []):
-        host = proxy.get('host')
-        port = proxy.get('port', 6053)
-        if host:
-            is_online, message = test_ble_proxy(host, port)
-            proxy_status.append({
-                'host': host,
-                'port': port,
-                'online': is_online,
-                'message': message
-            })
+def log_task_exit(task):
+    """Done callback: report a background task that stopped on its own"""
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        logger.error(f"Background task {task.get_name()} failed", exc_info=error)
+    else:
+        logger.warning(f"Background task {task.get_name()} exited")
+
+def start_background_task(coro):
+    """Start a long-lived task, tracked for shutdown and logged if it ends early"""
+    task = asyncio.create_task(coro, name=coro.__name__)
+    task.add_done_callback(log_task_exit)
+    background_tasks.append(task)
+
+@app.before_serving
+async def start_scan():
+    """Start the background scan and MQTT publish tasks alongside the web server"""
+    global event_loop, mqtt_queue, save_pending, http_session
+    event_loop = asyncio.get_running_loop()
+    save_pending = asyncio.Event()
+    await load_devices()
+    # One long-lived session so proxy polls reuse keep-alive connections
+    http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=PROXY_CONNECTION_LIMIT,
+            ttl_dns_cache=300,
+            keepalive_timeout=PROXY_KEEPALIVE_TIMEOUT
+        ),
+        headers=PROXY_REQUEST_HEADERS,
+        # We ask for identity encoding, so skip the decompression layer entirely
+        auto_decompress=False
+    )
+    mqtt_queue = asyncio.Queue(maxsize=MQTT_QUEUE_MAX)
+    for coro in (mqtt_supervisor(), mqtt_publish_loop(), device_saver(), device_pruner()):
+        start_background_task(coro)
+    
+    # One long-lived supervisor per proxy, started exactly once
+    for host, port in configured_proxies():
+        start_background_task(proxy_supervisor(host, port))
+    logger.info("✅ Background scanning started")
+
+@app.after_serving
+async def stop_scan():
+    """Cancel the background tasks on shutdown"""
+    for task in background_tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            pass  # already logged by log_task_exit
+    background_tasks.clear()
     
-    return render_template_string("""
+    if http_session is not None:
+        await http_session.close()
+    
+    # Flush any save that was still waiting out its debounce window
+    if save_pending is not None and save_pending.is_set():
+        await flush_devices()
+
+INDEX_TEMPLATE = """
 <!DOCTYPE html>
 <html>
 <head>
@@ -500,6 +1128,9 @@ def index():
         table { border-collapse: collapse; width: 100%; margin-top: 20px; }
         th, td { border: 1px solid #ddd; padding: 12px; text-align: left; }
         th { background-color: #f2f2f2; font-weight: bold; }
+        .device-scroll { max-height: 600px; overflow: auto; margin-top: 20px; }
+        .device-scroll table { margin-top: 0; }
+        #device-rows td { height: 20px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }
         .proxy-list { display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 15px; margin: 20px 0; }
         .proxy-card { padding: 15px; border-radius: 8px; border: 1px solid #ddd; }
         .proxy-online { background-color: #d4edda; border-color: #c3e6cb; }
@@ -507,17 +1138,305 @@ def index():
         .icon { font-size: 1.2em; margin-right: 8px; }
     </style>
     <script>
+        // Element handles, looked up once the page has loaded
+        let ui = null;
+        
+        function escapeHtml(value) {
+            return String(value).replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+        }
+        
+        function writeStatus(status) {
+            const mqtt = ui.mqttStatus;
+            mqtt.className = 'status ' + (status.mqtt_connected ? 'success' : 'error');
+            mqtt.innerHTML = '<span class="icon">' + (status.mqtt_connected ? '📡' : '❌') + '</span>' +
+                '<strong>MQTT:</strong>&nbsp;' + (status.mqtt_connected ? 'Connected' : 'Disconnected');
+            
+            ui.proxyList.innerHTML = status.proxies.map(proxy =>
+                '<div class="proxy-card ' + (proxy.online ? 'proxy-online' : 'proxy-offline') + '">' +
+                '<h4>' + (proxy.online ? '✅' : '❌') + ' ' + escapeHtml(proxy.host) + ':' + proxy.port + '</h4>' +
+                '<p><strong>Status:</strong> ' + escapeHtml(proxy.message) + '</p>' +
+                '<button class="btn btn-primary" onclick="testProxy(' + escapeHtml(JSON.stringify(proxy.host)) + ', ' + proxy.port + ')">🧪 Test</button>' +
+                '</div>'
+            ).join('');
+            ui.updated.textContent = status.timestamp;
+        }
+        
+        // Only the rows in view (plus a buffer) exist in the DOM; spacer rows stand in for the rest
+        const ROW_HEIGHT = 45;
+        const ROW_BUFFER = 5;
+        const VIEW_HEIGHT = 600;  // .device-scroll max-height, used while it is still hidden
+        let deviceList = [];
+        
+        function appendCell(row, text) {
+            const cell = document.createElement('td');
+            cell.textContent = text;
+            row.appendChild(cell);
+            return cell;
+        }
+        
+        // Rows are cloned from the page's row template, so there is no HTML to parse
+        // and names need no escaping; the fields are filled in via textContent
+        function deviceRow() {
+            const row = ui.rowTemplate.cloneNode(true);
+            return {row: row, fields: Array.from(row.querySelectorAll('[data-field]')), values: []};
+        }
+        
+        function updateDeviceRow(entry, device) {
+            const values = [
+                device.mac,
+                device.name || 'Unknown',
+                (device.rssi !== null ? device.rssi : 'N/A') + ' dBm',
+                device.last_seen || 'N/A',
+                device.source || 'Unknown'
+            ];
+            // Only touch the cells whose text actually changed
+            for (let i = 0; i < values.length; i++) {
+                if (entry.values[i] !== values[i]) {
+                    entry.values[i] = values[i];
+                    entry.fields[i].textContent = values[i];
+                }
+            }
+        }
+        
+        function spacerRow() {
+            const row = document.createElement('tr');
+            const cell = appendCell(row, '');
+            cell.colSpan = 5;
+            cell.style.padding = '0';
+            cell.style.border = 'none';
+            return row;
+        }
+        
+        // Rows in the window, keyed by MAC, kept across renders and updated in place
+        const deviceNodes = new Map();
+        const topSpacer = spacerRow();
+        const bottomSpacer = spacerRow();
+        
+        function renderDeviceWindow(scrollTop, viewHeight) {
+            const start = Math.max(0, Math.floor(scrollTop / ROW_HEIGHT) - ROW_BUFFER);
+            const end = Math.min(deviceList.length, Math.ceil((scrollTop + viewHeight) / ROW_HEIGHT) + ROW_BUFFER);
+            
+            const nodes = [];
+            const visible = new Set();
+            if (start > 0) {
+                topSpacer.style.height = start * ROW_HEIGHT + 'px';
+                nodes.push(topSpacer);
+            }
+            for (const device of deviceList.slice(start, end)) {
+                let entry = deviceNodes.get(device.mac);
+                if (!entry) {
+                    entry = deviceRow();
+                    deviceNodes.set(device.mac, entry);
+                }
+                updateDeviceRow(entry, device);
+                visible.add(device.mac);
+                nodes.push(entry.row);
+            }
+            if (end < deviceList.length) {
+                bottomSpacer.style.height = (deviceList.length - end) * ROW_HEIGHT + 'px';
+                nodes.push(bottomSpacer);
+            }
+            
+            // Drop rows that left the window or the table
+            for (const [mac, entry] of deviceNodes) {
+                if (!visible.has(mac)) {
+                    entry.row.remove();
+                    deviceNodes.delete(mac);
+                }
+            }
+            // Move only the rows that are out of order, then trim what is left over
+            const body = ui.deviceRows;
+            let cursor = body.firstChild;
+            for (const node of nodes) {
+                if (node === cursor) {
+                    cursor = cursor.nextSibling;
+                } else {
+                    body.insertBefore(node, cursor);
+                }
+            }
+            while (cursor) {
+                const next = cursor.nextSibling;
+                cursor.remove();
+                cursor = next;
+            }
+        }
+        
+        function writeDevices(scrollTop, viewHeight) {
+            ui.deviceCount.textContent = deviceList.length;
+            ui.noDevices.style.display = deviceList.length ? 'none' : '';
+            ui.deviceScroll.style.display = deviceList.length ? '' : 'none';
+            renderDeviceWindow(scrollTop, viewHeight);
+        }
+        
+        // Updates only record what changed; one frame then does every DOM read
+        // before any write, so the browser lays the page out once per frame
+        let pendingStatus = null;
+        let devicesDirty = false;
+        let framePending = false;
+        
+        function scheduleFrame() {
+            if (!framePending) {
+                framePending = true;
+                requestAnimationFrame(renderFrame);
+            }
+        }
+        
+        function renderFrame() {
+            framePending = false;
+            const scroll = ui.deviceScroll;
+            const scrollTop = scroll.scrollTop;
+            const viewHeight = scroll.clientHeight || VIEW_HEIGHT;
+            
+            if (pendingStatus) {
+                writeStatus(pendingStatus);
+                pendingStatus = null;
+            }
+            if (devicesDirty) {
+                devicesDirty = false;
+                writeDevices(scrollTop, viewHeight);
+            }
+        }
+        
+        function updateStatus(status) {
+            pendingStatus = status;
+            scheduleFrame();
+        }
+        
+        function updateDevices(devices) {
+            deviceList = Object.values(devices);
+            devicesDirty = true;
+            scheduleFrame();
+        }
+        
+        function onDeviceScroll() {
+            // Scrolling only moves the window; it renders with the next frame
+            devicesDirty = true;
+            scheduleFrame();
+        }
+        
+        // The page itself is static; all live state comes from the JSON API.
+        // URLs are relative: under HA ingress the page is served from
+        // /api/hassio_ingress/<token>/, and root paths would go to HA core instead
+        let devices = {};
+        let devicesVersion = null;  // table version the last poll brought us up to
+        let deviceSocket = null;
+        
+        function mergeDevices(changes) {
+            // The server keeps the most recently seen last; null means removed
+            for (const [mac, device] of Object.entries(changes)) {
+                delete devices[mac];
+                if (device) devices[mac] = device;
+            }
+        }
+        
+        let lastStatusKey = null;
+        
+        // Returns whether anything but the timestamp changed since the last poll
+        function applyStatus(status) {
+            const {timestamp, ...rest} = status;
+            const key = JSON.stringify(rest);
+            const changed = key !== lastStatusKey;
+            lastStatusKey = key;
+            updateStatus(status);
+            return changed;
+        }
+        
+        function socketOpen() {
+            return deviceSocket !== null && deviceSocket.readyState === WebSocket.OPEN;
+        }
+        
+        function refresh() {
+            // Devices are pushed over the WebSocket; poll them only while it is down
+            if (socketOpen()) {
+                return fetch('api/status').then(response => response.json()).then(applyStatus);
+            }
+            // After the first poll only the devices changed since then are sent
+            const query = devicesVersion === null ? '' : '?since=' + devicesVersion;
+            return fetch('api/snapshot' + query).then(response => response.json()).then(data => {
+                // devices_version in the status tells us whether the table changed
+                const changed = applyStatus(data.status);
+                devicesVersion = data.status.devices_version;
+                if (data.devices) {
+                    devices = data.devices;
+                } else {
+                    mergeDevices(data.changes);
+                }
+                if (changed) updateDevices(devices);
+                return changed;
+            });
+        }
+        
+        // Only needed while the WebSocket is down: poll quickly while things change,
+        // back off while idle, stop while the tab is hidden
+        const POLL_MIN = 2000;
+        const POLL_MAX = 30000;
+        let pollDelay = POLL_MIN;
+        let pollTimer = null;
+        let pollBusy = false;
+        
+        function poll() {
+            clearTimeout(pollTimer);
+            if (pollBusy) return;
+            pollBusy = true;
+            refresh()
+                .then(changed => { pollDelay = changed ? POLL_MIN : Math.min(pollDelay * 2, POLL_MAX); })
+                .catch(() => { pollDelay = Math.min(pollDelay * 2, POLL_MAX); })
+                .finally(() => {
+                    pollBusy = false;
+                    if (!document.hidden && !socketOpen()) pollTimer = setTimeout(poll, pollDelay);
+                });
+        }
+        
+        // Reconnects back off on their own, independent of the poll delay
+        const RECONNECT_MIN = 5000;
+        const RECONNECT_MAX = 60000;
+        let reconnectDelay = RECONNECT_MIN;
+        
+        function connectDevices() {
+            let opened = false;
+            const url = new URL('ws/devices', location.href);
+            url.protocol = url.protocol.replace('http', 'ws');
+            deviceSocket = new WebSocket(url);
+            deviceSocket.binaryType = 'arraybuffer';
+            deviceSocket.onmessage = event => {
+                const message = JSON.parse(new TextDecoder().decode(event.data));
+                if (message.status) {
+                    applyStatus(message.status);
+                    return;
+                }
+                if (message.snapshot) {
+                    devices = message.snapshot;
+                } else {
+                    mergeDevices(message.devices);
+                }
+                updateDevices(devices);
+            };
+            // Status and devices are pushed while the socket is up, so polling stops
+            deviceSocket.onopen = () => {
+                opened = true;
+                reconnectDelay = RECONNECT_MIN;
+                clearTimeout(pollTimer);
+            };
+            deviceSocket.onclose = () => {
+                // Polling stopped while the socket was up; if it never opened, polling
+                // is still running on its own backoff and is left alone
+                if (opened) poll();
+                setTimeout(connectDevices, reconnectDelay);
+                reconnectDelay = Math.min(reconnectDelay * 2, RECONNECT_MAX);
+            };
+        }
+        
         function scanNow() {
-            fetch('/api/scan_now', {method: 'POST'})
+            fetch('api/scan_now', {method: 'POST'})
                 .then(response => response.json())
                 .then(data => {
                     alert('Scan initiated: ' + data.message);
-                    setTimeout(() => location.reload(), 2000);
+                    poll();
                 });
         }
         
         function testProxy(host, port) {
-            fetch('/api/test_proxy', {
+            fetch('api/test_proxy', {
                 method: 'POST',
                 headers: {'Content-Type': 'application/json'},
                 body: JSON.stringify({host: host, port: port})
@@ -528,49 +1447,60 @@ def index():
         
         function clearDevices() {
             if(confirm('Clear all discovered devices?')) {
-                fetch('/api/clear_devices', {method: 'POST'})
+                fetch('api/clear_devices', {method: 'POST'})
                     .then(response => response.json())
                     .then(data => {
                         alert(data.message);
-                        location.reload();
+                        poll();
                     });
             }
         }
         
-        // Auto-refresh every 30 seconds
-        setTimeout(() => location.reload(), 30000);
+        // Everything arrives over the WebSocket as it changes; polling covers outages
+        document.addEventListener('DOMContentLoaded', () => {
+            ui = {
+                mqttStatus: document.getElementById('mqtt-status'),
+                proxyList: document.getElementById('proxy-list'),
+                updated: document.getElementById('updated'),
+                rowTemplate: document.getElementById('device-row-template').content.firstElementChild,
+                deviceRows: document.getElementById('device-rows'),
+                deviceCount: document.getElementById('device-count'),
+                noDevices: document.getElementById('no-devices'),
+                deviceScroll: document.getElementById('device-scroll')
+            };
+            ui.deviceScroll.addEventListener('scroll', onDeviceScroll, {passive: true});
+            connectDevices();
+            poll();
+        });
+        document.addEventListener('visibilitychange', () => {
+            clearTimeout(pollTimer);
+            if (!document.hidden && !socketOpen()) poll();
+        });
     </script>
 </head>
 <body>
     <div class="container">
         <h1>🔍 BLE Scanner v{{ version }}</h1>
         
-        <div class="status {{ 'success' if mqtt_connected else 'error' }}">
-            <span class="icon">{{ '📡' if mqtt_connected else '❌' }}</span>
-            <strong>MQTT:</strong> {{ 'Connected' if mqtt_connected else 'Disconnected' }}
+        <div id="mqtt-status" class="status warning">
+            <span class="icon">⏳</span>
+            <strong>MQTT:</strong>&nbsp;Loading...
         </div>
         
         <div class="controls">
             <h3>🎛️ Controls</h3>
             <button class="btn btn-primary" onclick="scanNow()">🔄 Scan Now</button>
             <button class="btn btn-warning" onclick="clearDevices()">🗑️ Clear Devices</button>
-            <button class="btn btn-success" onclick="location.reload()">♻️ Refresh</button>
+            <button class="btn btn-success" onclick="poll()">♻️ Refresh</button>
         </div>
         
         <h2>🌐 BLE Proxy Status</h2>
-        <div class="proxy-list">
-            {% for proxy in proxy_status %}
-            <div class="proxy-card {{ 'proxy-online' if proxy.online else 'proxy-offline' }}">
-                <h4>{{ '✅' if proxy.online else '❌' }} {{ proxy.host }}:{{ proxy.port }}</h4>
-                <p><strong>Status:</strong> {{ proxy.message }}</p>
-                <button class="btn btn-primary" onclick="testProxy('{{ proxy.host }}', {{ proxy.port }})">🧪 Test</button>
-            </div>
-            {% endfor %}
-    </div>
+        <div id="proxy-list" class="proxy-list"></div>
     
-        <h2>📱 Discovered BLE Devices ({{ device_count }})</h2>
-        {% if devices %}
-        <table>
+        <h2>📱 Discovered BLE Devices (<span id="device-count">0</span>)</h2>
+        <div id="device-scroll" class="device-scroll" style="display: none">
+        <table id="device-table">
+            <thead>
             <tr>
                 <th>MAC Address</th>
                 <th>Name</th>
@@ -578,87 +1508,169 @@ def index():
                 <th>Last Seen</th>
                 <th>Source</th>
             </tr>
-            {% for mac, device in devices.items() %}
-            <tr>
-                <td><code>{{ mac }}</code></td>
-                <td>{{ device.get('name', 'Unknown') }}</td>
-                <td>{{ device.get('rssi', 'N/A') }} dBm</td>
-                <td>{{ device.get('last_seen', 'N/A') }}</td>
-                <td>{{ device.get('source', 'Unknown') }}</td>
-            </tr>
-            {% endfor %}
+            </thead>
+            <tbody id="device-rows"></tbody>
         </table>
-        {% else %}
-        <div class="status warning">
+        </div>
+        <template id="device-row-template">
+            <tr><td><code data-field="mac"></code></td><td data-field="name"></td><td data-field="rssi"></td><td data-field="last_seen"></td><td data-field="source"></td></tr>
+        </template>
+        <div id="no-devices" class="status warning">
             <span class="icon">⚠️</span>
             No BLE devices discovered yet. Click "Scan Now" or check proxy connectivity.
-                            </div>
-        {% endif %}
+        </div>
         
-        <p><em>Last updated: {{ timestamp }} | Auto-refresh in 30s</em></p>
+        <p><em>Last updated: <span id="updated">-</span> | Devices update live</em></p>
     </div>
 </body>
 </html>
-    """, 
-    version=ADDON_VERSION,
-    mqtt_connected=mqtt_client and mqtt_client.is_connected() if mqtt_client else False,
-    proxy_count=len(config.get('bleProxies', [])),
-    device_count=len(discovered_devices),
-    devices=discovered_devices,
-    proxy_status=proxy_status,
-    timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    )
+"""
 
-@app.route('/api/status')
-def api_status():
-    """API status endpoint"""
-    return jsonify({
+def gzip_body(body):
+    """Gzip a response body (blocking; run per-request bodies in a worker thread)"""
+    return gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+
+def accepts_gzip():
+    """Whether the current request accepts a gzip-encoded response"""
+    # `in` ignores quality, so it would take "gzip;q=0" as accepting gzip
+    return request.accept_encodings['gzip'] > 0
+
+async def gzip_devices_json(body):
+    """The device table JSON gzipped, compressed once per devices_version"""
+    global devices_json_gzip
+    version = devices_version
+    if devices_json_gzip is None or devices_json_gzip[0] != version:
+        compressed = await asyncio.to_thread(gzip_body, body)
+        devices_json_gzip = (version, compressed)
+        return compressed
+    return devices_json_gzip[1]
+
+# The dashboard has no server-side state, so it is rendered (and compressed) once at import
+INDEX_HTML = INDEX_TEMPLATE.replace('{{ version }}', ADDON_VERSION).encode()
+INDEX_HTML_GZIP = gzip_body(INDEX_HTML)
+
+@app.route('/')
+async def index():
+    """Main dashboard"""
+    headers = {'Cache-Control': 'public, max-age=300', 'Vary': 'Accept-Encoding'}
+    if accepts_gzip():
+        headers['Content-Encoding'] = 'gzip'
+        return Response(INDEX_HTML_GZIP, mimetype='text/html', headers=headers)
+    return Response(INDEX_HTML, mimetype='text/html', headers=headers)
+
+@app.after_request
+async def compress_response(response):
+    """Gzip the remaining per-request HTML and JSON responses when the client accepts it"""
+    # The dashboard and /api/devices pick their own encoding from cached bodies
+    if (response.status_code != 200 or response.mimetype not in COMPRESS_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = await response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+    response.vary.add('Accept-Encoding')
+    if accepts_gzip():
+        # These bodies are unique per request, so compress off the event loop, uncached
+        response.set_data(await asyncio.to_thread(gzip_body, body))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def proxy_status_list():
+    """What the proxy supervisors last saw, rather than probing on every request"""
+    proxy_status = []
+    for host, port in configured_proxies():
+        is_online, message = proxy_connections.get(f"{host}:{port}", (False, "Not polled yet"))
+        proxy_status.append({'host': host, 'port': port, 'online': is_online, 'message': message})
+    return proxy_status
+
+def status_payload():
+    """Scanner status as reported by /api/status and /api/snapshot"""
+    return {
         "version": ADDON_VERSION,
         "status": "running",
-        "mqtt_connected": mqtt_client.is_connected() if mqtt_client else False,
-        "proxy_count": len(config.get('bleProxies', [])),
+        "mqtt_connected": mqtt_client is not None,
+        "proxy_count": len(config.bleProxies),
+        "connected_proxies": connected_proxy_count,
         "device_count": len(discovered_devices),
+        "devices_version": devices_version,
+        "proxies": proxy_status_list(),
+        # Formatted locally: now_iso is the ingest clock, ticked only per scan batch
         "timestamp": datetime.now().isoformat()
-    })
+    }
+
+@app.route('/api/status')
+async def api_status():
+    """API status endpoint"""
+    return jsonify(status_payload())
+
+@app.route('/api/snapshot')
+async def api_snapshot():
+    """Status and the device table in one response, for dashboard polling"""
+    # ?since=<devices_version> returns only the devices changed after that version
+    since = request.args.get('since', type=int)
+    changes = serialize_device_changes(since) if since is not None else None
+    # Splice in the cached table bytes rather than re-encoding every device
+    if changes is None:
+        devices = b',"devices":' + serialize_devices()
+    else:
+        devices = b',"changes":' + changes
+    body = b'{"status":' + orjson.dumps(status_payload()) + devices + b'}'
+    return Response(body, mimetype='application/json')
 
 @app.route('/api/devices')
-def api_devices():
+async def api_devices():
     """API devices endpoint"""
-    return jsonify(discovered_devices)
+    body = serialize_devices()
+    etag = devices_json_etag
+    gzipped = accepts_gzip()
+    if gzipped:
+        # Each encoding gets its own ETag, so caches never swap one body for the other
+        etag += '-gzip'
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    elif gzipped:
+        response = Response(await gzip_devices_json(body), mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    # Let clients keep the body but always revalidate it against the ETag
+    response.cache_control.no_cache = True
+    return response
+
+@app.route('/api/devices/<mac>')
+async def api_device(mac):
+    """Full record, including manufacturer data, for a single device"""
+    device = discovered_devices.get(parse_mac(mac))
+    if device is None:
+        return jsonify({"success": False, "message": "Unknown device"}), 404
+    return Response(orjson.dumps(device), mimetype='application/json')
 
 @app.route('/api/scan_now', methods=['POST'])
-def api_scan_now():
+async def api_scan_now():
     """Manual scan trigger"""
     try:
         devices_found = 0
-        proxies_scanned = 0
+        proxies = configured_proxies()
+        proxies_scanned = len(proxies)
         
-        for proxy in config.get('bleProxies', []):
-            host = proxy.get('host')
-            port = proxy.get('port', 6053)
-            
-            if host:
-                proxies_scanned += 1
-                devices = scan_ble_proxy(host, port)
-                
-                for device in devices:
-                    mac = device.get('mac')
-                    if mac:
-                        device['source'] = f"{host}:{port}"
-                        device['last_seen'] = datetime.now().isoformat()
-                        
-                        if mac not in discovered_devices:
-                            discovered_devices[mac] = device
-                            create_mqtt_device(mac, device)
-                            devices_found += 1
-                        else:
-                            # Update existing device
-                            discovered_devices[mac].update(device)
+        # Scan all proxies concurrently; results are processed here on the loop
+        results = await asyncio.gather(*(fetch_proxy_scan(host, port) for host, port in proxies))
+        tick_clock()
+        for (host, port), devices in zip(proxies, results):
+            source = f"{host}:{port}"
+            if devices is not None and source in proxy_wakeups:
+                # The proxy is back; don't leave its supervisor sleeping in backoff
+                proxy_wakeups[source].set()
+            for adv in devices or []:
+                if process_ble_advertisement(adv, source):
+                    devices_found += 1
         
         message = f"Scanned {proxies_scanned} proxies, found {devices_found} new devices"
         logger.info(f"Manual scan: {message}")
         
-    return jsonify({
+        return jsonify({
             "success": True,
             "message": message,
             "proxies_scanned": proxies_scanned,
@@ -670,17 +1682,17 @@ def api_scan_now():
         return jsonify({"success": False, "message": str(e)}), 500
 
 @app.route('/api/test_proxy', methods=['POST'])
-def api_test_proxy():
+async def api_test_proxy():
     """Test specific proxy connectivity"""
     try:
-    data = request.get_json()
+        data = await request.get_json()
         host = data.get('host')
         port = data.get('port', 6053)
         
         if not host:
             return jsonify({"success": False, "message": "Host required"}), 400
             
-        is_online, message = test_ble_proxy(host, port)
+        is_online, message = await probe_proxy(host, port)
         
         return jsonify({
             "success": is_online,
@@ -693,18 +1705,50 @@ def api_test_proxy():
         logger.error(f"Proxy test failed: {e}")
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.websocket('/ws/devices')
+async def ws_devices():
+    """Push the device table, then only the devices that changed, and status changes to a dashboard"""
+    subscriber = DeviceSubscriber()
+    subscriber.wakeup.set()
+    device_subscribers.add(subscriber)
+    try:
+        while True:
+            await subscriber.wakeup.wait()
+            subscriber.wakeup.clear()
+            # Changes made while a send is in flight pile up and go out together
+            if subscriber.resync:
+                subscriber.resync = False
+                subscriber.changed.clear()
+                await websocket.send(b'{"snapshot":' + serialize_devices() + b'}')
+            elif subscriber.changed:
+                changed, subscriber.changed = subscriber.changed, set()
+                # Oldest change first, like the table, so the dashboard keeps the
+                # server's order; removed devices go out as null
+                changed = sorted(changed, key=lambda mac: device_changes.get(mac, 0))
+                await websocket.send(orjson.dumps({"devices": {mac: discovered_devices.get(mac) for mac in changed}}))
+            if subscriber.status:
+                subscriber.status = False
+                await websocket.send(orjson.dumps({"status": status_payload()}))
+    finally:
+        device_subscribers.discard(subscriber)
+
 @app.route('/api/clear_devices', methods=['POST'])
-def api_clear_devices():
+async def api_clear_devices():
     """Clear all discovered devices"""
     try:
         global discovered_devices
         count = len(discovered_devices)
         discovered_devices.clear()
+        invalidate_devices_json()
+        notify_devices_reset()
+        last_published.clear()
+        last_processed.clear()
+        save_devices()
         
         message = f"Cleared {count} devices"
         logger.info(message)
-            
-            return jsonify({
+        
+        return jsonify({
             "success": True,
             "message": message,
             "cleared_count": count
@@ -726,34 +1770,26 @@ if __name__ == '__main__':
         exit(1)
     
     # Log configuration details
-    ble_proxies = config.get('bleProxies', [])
-    mqtt_config = config.get('mqtt', {})
+    mqtt_config = config.mqtt or MqttOptions()
     
-    logger.info(f"📡 Configured BLE Proxies: {len(ble_proxies)}")
-    for i, proxy in enumerate(ble_proxies, 1):
-        logger.info(f"   {i}. {proxy.get('host', 'unknown')}:{proxy.get('port', 6053)}")
+    logger.info(f"📡 Configured BLE Proxies: {len(config.bleProxies)}")
+    for i, proxy in enumerate(config.bleProxies, 1):
+        logger.info(f"   {i}. {proxy.host or 'unknown'}:{proxy.port}")
         
     logger.info(f"📮 MQTT Configuration:")
-    logger.info(f"   Host: {mqtt_config.get('host', 'auto-detect')}")
-    logger.info(f"   Port: {mqtt_config.get('port', 1883)}")
-    logger.info(f"   Discovery: {mqtt_config.get('discovery', True)}")
-    
-    logger.info("=== SETTING UP MQTT ===")
-    if setup_mqtt():
-        logger.info("✅ MQTT setup successful")
-    else:
-        logger.error("❌ MQTT setup failed - continuing without MQTT")
+    logger.info(f"   Host: {mqtt_config.host or 'auto-detect'}")
+    logger.info(f"   Port: {mqtt_config.port}")
+    logger.info(f"   Discovery: {mqtt_config.discovery}")
     
-    logger.info("=== STARTING BLE SCANNER THREAD ===")
-    scanner_thread = threading.Thread(target=ble_scanner_thread, daemon=True)
-    scanner_thread.start()
-    logger.info("✅ Background scanning started")
+    logger.info("📮 MQTT connects in the background once the server is up")
     
-    logger.info("=== STARTING FLASK SERVER ===")
+    logger.info("=== STARTING UVICORN SERVER ===")
     logger.info("🌐 Web interface will be available on port 8099")
     logger.info("="*60)
     try:
-        app.run(host='0.0.0.0', port=8099, debug=False, threaded=True)
+        # State is process-local; a single worker owns the MQTT session and scan tasks.
+        # No access log: the UI polls /api/devices and each line costs a write on the loop
+        uvicorn.run(app, host='0.0.0.0', port=8099, workers=1, loop='uvloop', http='httptools', log_level='info', access_log=False)
     except Exception as e:
-        logger.error(f"Flask startup error: {e}")
+        logger.error(f"Uvicorn startup error: {e}")
         raise 
\ No newline at end of file
@@ -15,7 +15,7 @@ else
     exit 1
 fi
 
-# DEBUGGING: Start Flask directly (bypassing Gunicorn to debug segfault)
+# Start the Quart ASGI app under Uvicorn (single event loop)
 cd /opt/ble_scanner || exit 1
-bashio::log.info "Running Flask directly to isolate segfault..."
+bashio::log.info "Starting Uvicorn ASGI server..."
 exec python3 main.py 
\ No newline at end of file